@@ -44,6 +44,9 @@ def setup(app):
     # get the VHDL source code root folder parameter from config file into the domain environment data
     app.add_config_value('vhdl_root', '', 'env')
 
+    # enable caching of the parsed VHDL files between builds
+    app.add_config_value('vhdl_parse_cache', True, 'env')
+
 def add_css_files(app, exc):
     """ Copy the assets from this package to the build folder.
 
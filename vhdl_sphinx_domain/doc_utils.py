@@ -323,7 +323,7 @@ def make_vhdl_entity_table(generics, ports):
 
 
         Parameters:
-            generics (list): List of Namespace objects describing the generics interface. Each dict
+            generics (list): List of InterfaceInfo objects describing the generics interface. Each object
                 shall contain the ``.names``, ``.definition`` and ``.comments`` attributes.
 
             ports (list): Same as above, but for port interfaces.
@@ -229,36 +229,38 @@ class VHDLIncludeDirective(VHDLDirective):
         return doc_utils.parse_comment_block(self.state, lines)
 
 class VHDLParseDirective(VHDLDirective):
-    """ Loads and parse the specified VHDL file.
+    """ Loads and parse the specified VHDL file(s).
 
     The parse results are stored in the `vhdl_parser` object for reference by other directives.
+    When multiple files are specified, they are parsed in parallel.
 
-    Directive arguments: vhdl_file_name
+    Directive arguments: vhdl_file_name [vhdl_file_name ...]
 
     Directive options: None
     """
     required_arguments = 1
+    optional_arguments = 1000
     has_content = False
 
     def __init__(self, name, arguments, options, *args):
-        """ Initialize the directive by extracting the directive argument.
+        """ Initialize the directive by extracting the directive arguments.
         """
         super().__init__(name, arguments, options, *args)
 
-        # Store the full filename of the VHDL file given as a directive argument by prepending the
+        # Store the full filenames of the VHDL files given as directive arguments by prepending the
         # root VHDL folder found in the config file. This will be used in `run()`.
         vhdl_root_folder = self.config.vhdl_root
-        self.vhdl_filename = os.path.join(vhdl_root_folder, arguments[0])
+        self.vhdl_filenames = [os.path.join(vhdl_root_folder, arg) for arg in arguments]
 
     def run(self):
-        """ Executes the directive by parsing the specified filename and storing the result in the domain's parser object for future references.
+        """ Executes the directive by parsing the specified filenames and storing the result in the domain's parser object for future references.
 
         Returns:
             list: list of nodes to add to the document. In this case, this is an empty list.
         """
         # print(f'state={dir(self.state.document)}')
         # parser = self.env.domaindata[VHDLDomain.name]['parser']
-        self.vhdl_parser.parse_file(self.vhdl_filename)
+        self.vhdl_parser.parse_files(self.vhdl_filenames)
         return []
 
 
@@ -367,7 +369,9 @@ class VHDLDomain(Domain):
         # we create an instance of the parser within this domain instance.
         # In the directives, we access through the BuildEnvironment object as end.domains['vhdl].parser
         # We tried to put it in the data, but that gets pickled, and the pickle cannot digest the parser object.
-        self.vhdl_parser = VHDLParser()
+        # The parse results of each file are cached in the doctree folder to speed up rebuilds.
+        cache_dir = os.path.join(env.doctreedir, '.vhdl_parse_cache') if env.config.vhdl_parse_cache else None
+        self.vhdl_parser = VHDLParser(cache_dir=cache_dir)
         if self.verbose:
             print(f'Created VHDL parser instance for domain {self.name} in environment {env}')
 
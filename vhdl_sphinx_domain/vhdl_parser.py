@@ -5,8 +5,17 @@ and extract the key information (entities, ports etc.) in an easy to use structu
 # Standard packages
 import sys
 import os
+import re
 import time
 import textwrap
+import io
+import functools
+import hashlib
+import pickle
+import importlib.metadata
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
 
 # Pypi packages
 
@@ -16,15 +25,104 @@ from vsg import vhdlFile, token
 
 # Local packages
 
+from . import __version__
 from .xelement import XElement
 from .ansi import *
 
+# Format of the cached file element trees. Increment it whenever the structure of the processed
+# element trees changes, so the trees cached by an earlier format are parsed again.
+_CACHE_FORMAT = 1
+
+def _get_vsg_version():
+    try:
+        return importlib.metadata.version('vsg')
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+# The cached trees also depend on the VSG tokenizer and on the comment processing of this package
+_CACHE_VERSION = (_CACHE_FORMAT, __version__, _get_vsg_version())
+
 class Namespace(dict):
     """ Dict whose values can be accessed as attributes
     """
     def __getattr__(self,name): return self.get(name)
     def __setattr__(self,name,value): self[name]=value
 
+# Records describing the analyzed language elements. They are slotted dataclasses rather than
+# Namespace dicts, since one is created for every port and generic.
+
+@dataclass(slots=True)
+class InterfaceInfo:
+    """ Port or generic of an entity, or isolated comment block in the interface list (with no names).
+    """
+    names: list  # identifier names
+    definition: str  # rest of the port/generic definition
+    comments: str  # head and tail comments, newline-separated
+
+@dataclass(slots=True)
+class EntityInfo:
+    """ Entity declared in a file. See :meth:`VHDLParser.analyze_entities`.
+    """
+    name: str
+    ports: list  # list of InterfaceInfo
+    generics: list  # list of InterfaceInfo
+    brief: list  # lines of the brief description
+    details: list  # lines of the detailed description
+    tail_comment: XElement
+    source_file: str
+    entity_node: XElement
+    file_node: XElement
+
+@dataclass(slots=True)
+class UseInfo:
+    """ Selected name of a USE clause.
+    """
+    label: str
+    node: XElement
+    head_comments: XElement = None
+    tail_comments: XElement = None
+
+@dataclass(slots=True)
+class LibraryInfo:
+    """ Library declared in a LIBRARY clause. See :meth:`VHDLParser.analyze_libraries`.
+    """
+    name: str
+    node: XElement
+    source_file: str
+    use: list = field(default_factory=list)  # list of UseInfo
+    head_comments: XElement = None
+    tail_comments: XElement = None
+
+_replace_regex_cache = {}  # {substrings tuple: compiled alternation regex} used by VHDLParser.replace()
+
+# Matches the comment marks and Doxygen markers removed from comment lines by VHDLParser.remove_comment_marks():
+# - the leading whitespace followed by the '/*', '--!' and '--' leading comment marks
+# - the trailing '*/' comment mark followed by the trailing whitespace
+# - the '@brief' and '@details' Doxygen markers anywhere in the line
+_COMMENT_MARKS_RE = re.compile(r'^[^\S\n]*(?:/\*)?(?:--!)?(?:--)?|(?:\*/)?[^\S\n]*$|@brief|@details', re.MULTILINE)
+
+# Interned tags of the elements handled by the comment processing methods. XElement interns the
+# tags of all the elements, so the tags can be compared by identity with these constants.
+TAG_CR = sys.intern('parser.carriage_return')
+TAG_WS = sys.intern('parser.whitespace')
+TAG_BLANK = sys.intern('parser.blank_line')
+TAG_COMMENT = sys.intern('parser.comment')
+TAG_DELIMITED_BEGIN = sys.intern('delimited_comment.beginning')
+TAG_DELIMITED_END = sys.intern('delimited_comment.ending')
+TAG_COMMENT_BLOCK = sys.intern('comment_block')
+TAG_BLANK_LINE = sys.intern('blank_line')
+# Tags handled by the comment tests of VHDLParser.group_comments()
+_COMMENT_TAGS = frozenset((TAG_CR, TAG_WS, TAG_BLANK, TAG_COMMENT, TAG_DELIMITED_BEGIN, TAG_COMMENT_BLOCK, TAG_BLANK_LINE))
+
+_FENCE_CHARS = frozenset('*=-#%^')  # characters of the fences detected by VHDLParser.is_fence()
+
+@functools.lru_cache(maxsize=128)
+def _compile_markers(*markers):
+    """ Returns a compiled regex that finds any of the literal strings `markers`.
+    """
+    return re.compile('|'.join(re.escape(m) for m in markers))
+
+
 class VHDLParser(XElement):
     """ ElementTree object representing a set of VHDL files and allows loading and parsing VHDL files, and provides direct access to entity, architectures,
     variables etc across the project
@@ -32,9 +130,15 @@ class VHDLParser(XElement):
 
     """
 
-    def __init__(self):
+    def __init__(self, cache_dir=None):
         """ Creates a new parser object.
 
+        Parameters:
+
+            cache_dir (str): Folder in which the processed element tree of each parsed file is
+                cached so that unchanged files do not have to be parsed again in subsequent runs.
+                If `None`, parse results are not cached.
+
         The following attributes are initialied:
 
         - ``files`` (dict): dict in the format ``{filename: file_node, ...}`` that maps filenames to
@@ -54,6 +158,10 @@ class VHDLParser(XElement):
         self.files = {}
         self.entities = Namespace()
         self.labels = {}  # Contains a dict of all labeled objects defined in various namespaces. { (namespace, label_name): labeled_object}
+        self.cache_dir = cache_dir
+        self._comment_index = {}  # {filename: list of the (text, text lines) of each comment_block node of the file}
+        self._entity_cache = {}  # {entity name as requested: entity}, avoids case-folding the names on every lookup
+        self._comments_cache = {}  # {(entity_name_in_lowercase, search parameters...): lines returned by get_comments()}
 
 
     def print_debug(self, verbose_level, *args):
@@ -106,29 +214,66 @@ class VHDLParser(XElement):
 
         root = XElement('file', filename=token_list[0].filename)
         elem = [root]
+        parent = root  # current parent element, i.e. elem[-1]
         col = 0
         line = 0
+        new_element = XElement  # local name lookups are faster in this loop, which runs once per token
+        tags = {}  # {token class: tag}. VSG derives the unique id of a token from its class.
         for t in token_list:
-            for prod in t.enter_prod:
-                # ne = XElement(prod, col=col, line=line, is_prod=True)
-                ne = XElement(prod, is_prod=True)
-                elem[-1].append(ne)
-                elem.append(ne)
+            enter_prod = t.enter_prod
+            if enter_prod:  # most tokens do not enter a production
+                for prod in enter_prod:
+                    # ne = XElement(prod, col=col, line=line, is_prod=True)
+                    ne = new_element(prod, is_prod=True)
+                    parent.append(ne)
+                    elem.append(ne)
+                    parent = ne
             # if 1 or t.sub_token not in ('whitespace'):
             #     print(f"[{i}]{hier!s}({t.sub_token}): {t.get_value()}")
-            ne = XElement(t.get_unique_id('.'), col=col, line=line)
-            ne.text = t.value
-            elem[-1].append(ne)
-            col += len(ne.text)
-            if ne.tag == 'parser.carriage_return':
+            text = t.value
+            try:
+                tag = tags[type(t)]
+            except KeyError:
+                tag = tags[type(t)] = t.get_unique_id('.')
+            ne = new_element(tag, text=text, col=col, line=line)
+            parent.append(ne)
+            col += len(text)
+            if ne.tag is TAG_CR:
                 col = 0
                 line += 1
-            for prod in t.leave_prod:
-                elem.pop()
+            if t.leave_prod:
+                for prod in t.leave_prod:
+                    elem.pop()
+                parent = elem[-1]
         return root
 
 
-    def group_comments(self, et, verbose=0):
+    def process_comments(self, et, verbose=0):
+        """ Group the comments of the element tree into comment blocks and move the header and tail
+        comments into their associated production elements.
+
+        This is equivalent to calling :meth:`group_comments`, :meth:`move_header_comments` and
+        :meth:`move_tail_comments` in sequence on the whole tree, but the tree is traversed only
+        once: each hierarchy level is fully processed after its production elements have been
+        processed.
+
+        The provided element tree is modified in-place, but the text represented by the tree is unchanged.
+
+        Parameters:
+
+            et (XElement): element tree to be processed
+
+            verbose (int): If non-zero, prints debugging messages
+        """
+        self.group_comments(et, verbose=verbose, recurse=False)
+        # Productions are processed before the header and tail comments of this level are moved into them
+        for e in et:
+            if e.get('is_prod'):
+                self.process_comments(e, verbose=verbose)
+        self.move_header_comments(et, verbose=verbose, recurse=False)
+        self.move_tail_comments(et, verbose=verbose, recurse=False)
+
+    def group_comments(self, et, verbose=0, recurse=True):
         """ Scan the Element tree and group sequence of comments lines into ``comment_block`` or ``blank_line`` elements.
 
         The provided element tree is modified in-place, but the text represented by the tree is unchanged.
@@ -142,87 +287,102 @@ class VHDLParser(XElement):
             et (XElement): element tree to be processed
 
             verbose (int): If non-zero, prints debugging messages
+
+            recurse (bool): If True, the production elements are processed recursively.
         """
         comment_group= []  # accumulates comment lines element that belong to the same comment group/block
         comment_group_col = None # column number of the first comment of the group
         comment_line = []  # used to accumulate whitespce and comments before potentiallly writing those to the group if they qualify
         comment_line_col = None  # column number of the comment in the current comment line
         delimited_comment = False  # True if we are inside a delimited comment
+        groups = []  # (elements, tag) groups to create once the scan is done, so we can iterate over the tree without a copy
 
-        for e in list(et): # make a copy so we can safely modify the tree in-place
-            self.print_debug(verbose, f"Comment processing {UL}{RED if e.get('is_prod') else ''}{e.tag}{NOCOLOR} '{e.text!r}' @ line {e.get('line')} col {e.get('col')})")
+        for e in et:
+            if verbose:
+                self.print_debug(verbose, f"Comment processing {UL}{RED if e.get('is_prod') else ''}{e.tag}{NOCOLOR} '{e.text!r}' @ line {e.get('line')} col {e.get('col')})")
+            tag = e.tag
             # If we are in a comment block and get to the end
             if delimited_comment:
                 comment_line.append(e)
-                if e.tag == 'delimited_comment.ending':
+                if tag is TAG_DELIMITED_END:
                     delimited_comment = False
-                elif e.tag == 'parser.carriage_return':
+                elif tag is TAG_CR:
                     comment_group.extend(comment_line)
                     comment_line.clear()
                     if comment_group_col is None:
                         comment_group_col = comment_line_col
-            elif e.tag == 'delimited_comment.beginning':
+            elif tag not in _COMMENT_TAGS:  # most tokens are not comment tokens: test this first
+                if recurse and e.get('is_prod'):  # if a production node, recurse into it
+                    if verbose:
+                        self.print_debug(verbose, f'Production node {e=}')
+                    # recurse into production node
+                    self.group_comments(e, verbose=verbose)
+
+                if verbose:
+                    self.print_debug(verbose, f' Non-comment/non-blank token {e=}({e.text}): Grouping comments {comment_group}.')
+                # Group any ongoing comment block
+                if comment_group:
+                    groups.append((comment_group, 'comment_block'))
+                    comment_group = []
+                comment_group_col = None
+                comment_line.clear()
+                comment_line_col = None
+                # pp(et)
+            elif tag is TAG_DELIMITED_BEGIN:
                 comment_line.append(e)
                 delimited_comment = True
                 comment_line_col = e.col  # replace with real column
-            elif e.tag in ('parser.whitespace', 'parser.blank_line'):
-                self.print_debug(verbose, f'adding whitespace/blank line')
+            elif tag is TAG_WS or tag is TAG_BLANK:
+                if verbose:
+                    self.print_debug(verbose, f'adding whitespace/blank line')
                 comment_line.append(e)
-            elif e.tag == 'parser.comment':
+            elif tag is TAG_COMMENT:
                 comment_line.append(e)
                 comment_line_col = e.col # replace with real column
-            elif e.tag in ('comment_block', 'blank_line'):
+            elif tag is TAG_COMMENT_BLOCK or tag is TAG_BLANK_LINE:
                 pass
-            elif e.tag == 'parser.carriage_return':
-                self.print_debug(verbose, f'carriage_return, e=(tag={e.tag}, text={e.text!r}), group=(len={len(comment_group)},col={comment_group_col}), line=(len={len(comment_line)}, col={comment_line_col})')
+            else:  # carriage return
+                if verbose:
+                    self.print_debug(verbose, f'carriage_return, e=(tag={e.tag}, text={e.text!r}), group=(len={len(comment_group)},col={comment_group_col}), line=(len={len(comment_line)}, col={comment_line_col})')
                 comment_line.append(e)
 
                 # If we have the end of a comment that has the same or higher indentation than
                 # the existing comment group, add it to the group
                 if comment_line_col is not None and (not comment_group or comment_group_col is None or comment_line_col >= comment_group_col):
-                    self.print_debug(verbose, f'   Appending line to comment group')
+                    if verbose:
+                        self.print_debug(verbose, f'   Appending line to comment group')
                     comment_group.extend(comment_line)
                     comment_line.clear()
                     comment_line_col = None
                 # if we detect the comment end (empty line, comment with change of indentation),
                 # then create an comment block element with the current comment group
                 else:
-                    self.print_debug(verbose, f'   Blank or left indented comment line')
+                    if verbose:
+                        self.print_debug(verbose, f'   Blank or left indented comment line')
 
                     # First group the existing comment block
-                    self.print_debug(verbose, f'   Grouping comments {comment_group}. e={e}')
-                    et.group(comment_group, 'comment_block')
-                    comment_group.clear()
+                    if verbose:
+                        self.print_debug(verbose, f'   Grouping comments {comment_group}. e={e}')
+                    groups.append((comment_group, 'comment_block'))
+                    comment_group = []
                     comment_group_col = None
 
                     # Next process the ongoing comment line
                     if comment_line:
                         if comment_line_col is None: # if we have an empty line, create a special group with it
                             if comment_line[0].get('col') == 0:
-                                et.group(comment_line, 'blank_line')
+                                groups.append((comment_line, 'blank_line'))
+                                comment_line = []
                         else: # if it's not an empty line, start a new comment group
                             comment_group.extend(comment_line)
                             comment_group_col = comment_line_col
                     comment_line.clear()
                     comment_line_col = None
-            else:
-                if e.get('is_prod'):  # if a production node, recurse into it
-                    self.print_debug(verbose, f'Production node {e=}')
-                    # recurse into production node
-                    self.group_comments(e, verbose=verbose)
-
-                self.print_debug(verbose, f' Non-comment/non-blank token {e=}({e.text}): Grouping comments {comment_group}.')
-                # Group any ongoing comment block
-                et.group(comment_group, 'comment_block')
-                comment_group.clear()
-                comment_group_col = None
-                comment_line.clear()
-                comment_line_col = None
-                # pp(et)
         # process any dangling comment block at the end of this hierarchy level
-        et.group(comment_group, 'comment_block')
+        groups.append((comment_group, 'comment_block'))
+        et.groupall(groups)
 
-    def move_header_comments(self, et, verbose=0):
+    def move_header_comments(self, et, verbose=0, recurse=True):
         """ Scan the Element tree and move comments and spaces immediately before a production element into that element.
 
         The provided element tree is modified in-place, but the text represented by the tree is unchanged.
@@ -240,29 +400,37 @@ class VHDLParser(XElement):
 
             verbose (int): if non-zero, prints debugging messages
 
+            recurse (bool): If True, the production elements are processed recursively.
+
         """
         header_elements = []  # accumulate header elements before moving them into the production element
-        for e in list(et): # make a copy so we can safely modify the tree
-            self.print_debug(verbose, f"Header comment processing {e.tag} '{e.text!r}' @ ({e.line},{e.col})")
-            if e.tag == 'comment_block' and not e.col: # restart list on the comment block. Only the last block gets moved.
+        moves = []  # moves are done once the scan is complete, so we can iterate over the tree without a copy
+        for e in et:
+            if verbose:
+                self.print_debug(verbose, f"Header comment processing {e.tag} '{e.text!r}' @ ({e.line},{e.col})")
+            tag = e.tag
+            if tag is TAG_COMMENT_BLOCK and not e.col: # restart list on the comment block. Only the last block gets moved.
                 header_elements.clear()
                 header_elements.append(e)
-            elif e.tag == 'parser.whitespace' and not e.col:
+            elif tag is TAG_WS and not e.col:
                 header_elements.append(e)
-            elif e.tag in ('parser.whitespace', 'parser.blank_line', 'parser.carriage_return') and header_elements:
+            elif (tag is TAG_WS or tag is TAG_BLANK or tag is TAG_CR) and header_elements:
                 header_elements.append(e)
-            elif e.tag == 'parser.comment':  # to be removed
+            elif tag is TAG_COMMENT:  # to be removed
                 raise RuntimeError(' parser.comment tokens should not exist anymore')
             elif e.get('is_prod'): # if we have a production element and
-                self.move_header_comments(e, verbose=verbose) # recurse in production first so we don't move the comments again
+                if recurse:
+                    self.move_header_comments(e, verbose=verbose) # recurse in production first so we don't move the comments again
                 if header_elements:
-                    self.print_debug(verbose, f"{RED} Moving Header comment {''.join(ee.subtext for ee in header_elements)} @ ({header_elements[0].line}, {header_elements[0].col}) into {e.tag}{NOCOLOR}")
-                    et.move(header_elements, e, 0)
-                    header_elements.clear()
+                    if verbose:
+                        self.print_debug(verbose, f"{RED} Moving Header comment {''.join(ee.subtext for ee in header_elements)} @ ({header_elements[0].line}, {header_elements[0].col}) into {e.tag}{NOCOLOR}")
+                    moves.append((header_elements, e, 0))
+                    header_elements = []
             else: # We have a non-comment token
                 header_elements.clear()
+        et.moveall(moves)
 
-    def move_tail_comments(self, et, verbose=0):
+    def move_tail_comments(self, et, verbose=0, recurse=True):
         """ Scan the Element tree and move comments and spaces immediately after a production element into that element.
 
         Assumes that comments have been grouped into comment blocks by :meth:``group_comments``.
@@ -275,27 +443,35 @@ class VHDLParser(XElement):
 
             verbose (int): if non-zero, prints debugging messages
 
+            recurse (bool): If True, the production elements are processed recursively.
+
         """
         tail_elements = []  # accumulate tail elements that will be moved into the preceding production element
         last_prod = None #  production that can potentially receive the tail comment elements
-        for e in list(et): # make a copy so we can safely modify the tree
-            self.print_debug(verbose, f"Tail comment processing {e.tag} {e.subtext!r} @({e.line+1},{e.col+1}), last_prod={last_prod.tag if last_prod is not None else '?'}")
-            if last_prod is not None and (e.tag in ('parser.whitespace', 'parser.blank_line', 'parser.carriage_return') or e.text == ';'):
+        moves = []  # moves are done once the scan is complete, so we can iterate over the tree without a copy
+        for e in et:
+            if verbose:
+                self.print_debug(verbose, f"Tail comment processing {e.tag} {e.subtext!r} @({e.line+1},{e.col+1}), last_prod={last_prod.tag if last_prod is not None else '?'}")
+            tag = e.tag
+            if last_prod is not None and (tag is TAG_WS or tag is TAG_BLANK or tag is TAG_CR or e.text == ';'):
                 tail_elements.append(e)
-            elif last_prod is not None and e.tag == 'comment_block':
+            elif last_prod is not None and tag is TAG_COMMENT_BLOCK:
                 tail_elements.append(e)
-                self.print_debug(verbose, f"  {RED} moving tail comment {tail_elements=} into {last_prod}{NOCOLOR} ")
-                et.move(tail_elements, last_prod)
+                if verbose:
+                    self.print_debug(verbose, f"  {RED} moving tail comment {tail_elements=} into {last_prod}{NOCOLOR} ")
+                moves.append((tail_elements, last_prod, None))
                 last_prod = None
-                tail_elements.clear()
+                tail_elements = []
 
             elif e.get('is_prod'):
-                self.move_tail_comments(e, verbose=verbose) # recurse in production first so we don't move the comments again
+                if recurse:
+                    self.move_tail_comments(e, verbose=verbose) # recurse in production first so we don't move the comments again
                 last_prod = e
                 tail_elements.clear()
             else:
                 last_prod = None
                 tail_elements.clear()
+        et.moveall(moves)
 
 
             # last_prod = None
@@ -322,18 +498,100 @@ class VHDLParser(XElement):
 
 
 
-    def parse_file(self, filename, verbose=0):
-        """ Parse and analyze the specified VHDL file and add the resulting file node to this
-        element, and also stores summarized information on the file, entities etc.
+    def get_cache_filename(self, filename):
+        """ Returns the name of the file in which the parse results of `filename` are cached, or
+        `None` if caching is disabled.
+        """
+        if not self.cache_dir:
+            return None
+        key = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.pkl')
+
+    def load_cached_file(self, filename, verbose=0):
+        """ Returns the cached file element tree of `filename`, or `None` if the file was not
+        cached or has been modified since.
+
+        The cached tree is valid if it was cached with the same cache format, package version and
+        VSG version, and if the modification time and size of the file are unchanged. If only the
+        modification time changed (e.g. the file was touched or checked out again), the SHA1
+        digest of the file contents is compared with the cached one, and the modification time of
+        the cache entry is updated if the contents are unchanged.
+        """
+        cache_filename = self.get_cache_filename(filename)
+        if cache_filename is None:
+            return None
+        try:
+            stat = os.stat(filename)
+            with open(cache_filename, 'rb') as file:
+                # The version is pickled separately so an outdated tree is not unpickled at all
+                if pickle.load(file) != _CACHE_VERSION:
+                    return None
+                mtime_ns, size, sha1, file_element = pickle.load(file)
+        except Exception:  # missing, unreadable or outdated cache file: the file will be parsed again
+            return None
+        if size != stat.st_size:
+            return None
+        if mtime_ns != stat.st_mtime_ns:
+            try:
+                with open(filename, 'rb') as file:
+                    if hashlib.sha1(file.read()).hexdigest() != sha1:
+                        return None
+            except OSError:  # unreadable file: let the parser report the error
+                return None
+            self.save_cached_file(filename, file_element, stat, sha1, verbose=verbose)
+        self.print_debug(verbose, f'Using cached parse results for {filename}')
+        return file_element
 
-        ``self.files`` map is updated with the file node.
+    def save_cached_file(self, filename, file_element, stat, sha1, verbose=0):
+        """ Saves the processed element tree `file_element` of the file `filename` in the cache folder.
 
-        ``self.entities`` is updated with the summarized information on the entity(ies) in the file.
+        The cache is an optimization only: if the tree cannot be saved (e.g. the cache folder is not
+        writable or the disk is full), the file will simply be parsed again on the next build.
 
         Parameters:
 
-            filename (str): filename of the VHDL file to be parsed. The path is relative to the root
-                vhdl path defined in the sphinx config file.
+            filename (str): name of the parsed VHDL file
+
+            file_element (XElement): processed file element tree to be cached
+
+            stat (os.stat_result): status of the VHDL file taken before it was read
+
+            sha1 (str): hexadecimal SHA1 digest of the contents of the VHDL file
+
+            verbose (int): If non-zero, a warning is printed if the tree cannot be saved.
+        """
+        cache_filename = self.get_cache_filename(filename)
+        if cache_filename is None:
+            return
+        # Write to a temporary file first so an interrupted write does not leave a corrupted cache file
+        tmp_filename = f'{cache_filename}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_filename, 'wb') as file:
+                pickle.dump(_CACHE_VERSION, file, pickle.HIGHEST_PROTOCOL)
+                pickle.dump((stat.st_mtime_ns, stat.st_size, sha1, file_element), file, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_filename, cache_filename)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError, RecursionError) as e:  # unwritable cache or unpicklable tree
+            try:
+                os.remove(tmp_filename)
+            except OSError:  # the temporary file was not created or was already renamed
+                pass
+            self.print_debug(verbose, f'Warning: Could not cache the parse results of {filename}: {e!r}')
+
+    def build_file_element(self, filename, verbose=0):
+        """ Parse the specified VHDL file and return its processed element tree, without adding it to
+        this element.
+
+        The file is parsed with VSG, converted into an element tree and its comments are grouped
+        and moved into their associated production elements. This method does not modify the
+        parser state and can therefore be run in a worker process (see :meth:`parse_files`).
+
+        If a cache folder was specified when the parser was created, the processed element tree is
+        loaded from the cache if the file did not change since it was cached.
+
+        Parameters:
+
+            filename (str): filename of the VHDL file to be parsed.
 
             verbose (int): If non-zero, debugging messages are printed.
 
@@ -342,39 +600,135 @@ class VHDLParser(XElement):
             XElement: A :class:`XElement` with ``tag='file'`` and attribute
             ``filename=<current_filename>'`` whose children describe the parsed file.
         """
-        if filename in self.files:
-            print(f"{self!r}: Warning: File '{filename}' has already been parsed. Ignoring." )
-            return self.files[filename]
+        file_element = self.load_cached_file(filename, verbose=verbose)
+        if file_element is not None:
+            return file_element
+
         # Load the VHDL file
-        with open(filename, 'r') as file:
-            lines = file.readlines()
+        stat = os.stat(filename)
+        with open(filename, 'rb') as file:
+            data = file.read()
+        sha1 = hashlib.sha1(data).hexdigest() if self.cache_dir else None  # validates the cached parse results
+        # readlines() splits only on newlines. str.splitlines() would also split on the form feeds
+        # allowed in VHDL source and shift the line numbers.
+        lines = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8').readlines()
+        del data
 
         # Parse the file using VSG
         self.print_debug(verbose, f'Parsing the VHDL file {filename} into a token list using VSG')
+        t0 = time.perf_counter()
         vf = vhdlFile.vhdlFile(lines, sFilename=filename)
+        del lines  # the source text is no longer needed: free it before building the tree
+        t1 = time.perf_counter()
+        self.print_debug(verbose, f'   VSG parsed {len(vf.lAllObjects)} tokens in {t1 - t0:.3f} s')
 
         # Process the token list from VSG extract the hierarchy
         self.print_debug(verbose, f'Converting the {filename} token list into an Element tree')
         file_element = self.token_list_to_element_tree(vf.lAllObjects)
+        del vf  # the element tree holds the token text: free the VSG objects before processing the comments
+        t2 = time.perf_counter()
+        self.print_debug(verbose, f'   Element tree built in {t2 - t1:.3f} s')
 
         # Modify the element tree to group comments and move them into their associated production elements
         self.print_debug(verbose, f'Processing comments in {filename}')
-        self.group_comments(file_element, verbose=verbose)  # group line comments into blocks
+        # group line comments into blocks, move header comments into the immediately following
+        # production element and tail comments into the immediately preceding production element
+        self.process_comments(file_element, verbose=verbose)
         # pp(file_element)
-        self.move_header_comments(file_element, verbose=verbose)  # move header comments into the immediately following production element
+        self.print_debug(verbose, f'   Comments processed in {time.perf_counter() - t2:.3f} s')
 
-        # pp(file_element)
+        self.save_cached_file(filename, file_element, stat, sha1, verbose=verbose)
+        return file_element
 
-        self.move_tail_comments(file_element, verbose=verbose)  # move tail comments into the immediately preceding production element
+    def add_file_element(self, filename, file_element):
+        """ Add the processed element tree of a file to this element, and update the summarized
+        information on the file, entities etc.
 
+        Parameters:
+
+            filename (str): filename of the parsed VHDL file
+
+            file_element (XElement): processed file element tree returned by :meth:`build_file_element`
+        """
         self.append(file_element)
         self.files[filename] = file_element
+        # Index the text lines of the comment blocks of the file so comment searches do not have to
+        # walk the tree or rebuild the comment text. The comment blocks are not modified anymore.
+        self._comment_index[file_element.filename] = [(bc.subtext, bc.subtext.splitlines()) for bc in file_element.iter('comment_block')]
+        # New entities may shadow existing ones: discard the memoized entity lookups and comment search results
+        self._entity_cache.clear()
+        self._comments_cache.clear()
 
         # Update the quick-access tables that allows us to easily access the main language elements of the file.
         self.entities.update(self.analyze_entities(file_element))
 
+    def parse_file(self, filename, verbose=0):
+        """ Parse and analyze the specified VHDL file and add the resulting file node to this
+        element, and also stores summarized information on the file, entities etc.
+
+        ``self.files`` map is updated with the file node.
+
+        ``self.entities`` is updated with the summarized information on the entity(ies) in the file.
+
+        If a cache folder was specified when the parser was created, the processed element tree is
+        loaded from the cache if the file did not change since it was cached.
+
+        Parameters:
+
+            filename (str): filename of the VHDL file to be parsed. The path is relative to the root
+                vhdl path defined in the sphinx config file.
+
+            verbose (int): If non-zero, debugging messages are printed.
+
+        Returns:
+
+            XElement: A :class:`XElement` with ``tag='file'`` and attribute
+            ``filename=<current_filename>'`` whose children describe the parsed file.
+        """
+        if filename in self.files:
+            print(f"{self!r}: Warning: File '{filename}' has already been parsed. Ignoring." )
+            return self.files[filename]
+
+        file_element = self.build_file_element(filename, verbose=verbose)
+        self.add_file_element(filename, file_element)
         return file_element
 
+    def parse_files(self, filenames, workers=None, verbose=0):
+        """ Parse and analyze the specified VHDL files, like :meth:`parse_file`, but parse the files
+        in parallel in separate processes.
+
+        The files are parsed independently in worker processes. The resulting element trees are
+        then analyzed and added to this element in the main process in the order of `filenames`,
+        so labels collisions are detected as with :meth:`parse_file`.
+
+        Parameters:
+
+            filenames (list of str): filenames of the VHDL files to be parsed.
+
+            workers (int): Maximum number of worker processes. If `None`, the number of processors
+                on the machine is used. No more workers than files to parse are started. If ``workers=1``, the files are parsed sequentially in
+                this process.
+
+            verbose (int): If non-zero, debugging messages are printed.
+
+        Returns:
+
+            list: list of the :class:`XElement` file nodes corresponding to each of `filenames`.
+        """
+        new_filenames = [f for f in dict.fromkeys(filenames) if f not in self.files]
+        if workers == 1 or len(new_filenames) < 2:
+            return [self.parse_file(filename, verbose=verbose) for filename in filenames]
+
+        workers = min(workers or os.cpu_count() or 1, len(new_filenames))
+        # Send the files in chunks to reduce the inter-process communication overhead, while keeping
+        # enough chunks per worker to balance the load between files of different sizes
+        chunksize = max(1, len(new_filenames) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_parse_file_worker, new_filenames, repeat(self.cache_dir), repeat(verbose), chunksize=chunksize)
+            for filename, file_element in results:
+                self.add_file_element(filename, file_element)
+        return [self.files[filename] for filename in filenames]
+
 
     def add_label(self, namespace, labels, obj):
         """ Adds one or labels pointing to the object `obj` to the global label dict under the namespace `namespace`
@@ -388,12 +742,14 @@ class VHDLParser(XElement):
             obj: element associated with the label.
 
         """
-        if not isinstance(labels, list):
-            labels = [labels]
+        all_labels = self.labels
+        if type(labels) is str:
+            labels = (labels,)
         for label in labels:
-            if (namespace, label) in self.labels:
-                raise ValueError(f"Label {(namespace, label)} is already defined")
-            self.labels[(namespace, label)] = obj
+            key = (namespace, label)
+            # single lookup: setdefault returns the existing object if the label was already defined
+            if all_labels.setdefault(key, obj) is not obj:
+                raise ValueError(f"Label {key} is already defined")
 
     def get_head_and_tail_comments(self, node, verbose=0):
         """ Return the head and tail comment node of the object described by `node`.
@@ -412,15 +768,22 @@ class VHDLParser(XElement):
             elements can be `None` if unavailable.
 
         """
-        block_comments = node.findall('comment_block')
-        if verbose:
-            print(f'block comments  are {block_comments}')
-        n = len(block_comments)
+        # Search for the first and last comment blocks from each end of the children list instead
+        # of collecting all the comment blocks. The header comment is normally the first child and
+        # the tail comment the last one.
         head_comments = tail_comments = None
-        if n > 0:
-            head_comments = block_comments[0]
-        if n > 1:
-            tail_comments = block_comments[-1]
+        for e in node:
+            if e.tag is TAG_COMMENT_BLOCK:
+                head_comments = e
+                break
+        if head_comments is not None:
+            for e in reversed(node):
+                if e.tag is TAG_COMMENT_BLOCK:
+                    if e is not head_comments:
+                        tail_comments = e
+                    break
+        if verbose:
+            print(f'head and tail block comments are {head_comments}, {tail_comments}')
 
         return (head_comments, tail_comments)
 
@@ -439,45 +802,47 @@ class VHDLParser(XElement):
 
         Returns:
 
-            Namespace: Summary information on library usage
+            dict: Summary information on library usage, in the format ``{library_name_in_lowercase: LibraryInfo, ...}``
 
         """
         # Analyze LIBRARY clauses
-        libraries = Namespace  # get_node(summary, 'library')
-        libraries['work'] = Namespace(name='work', use=[], block_comment=[], tail_comment=[], node=None, source_file='')
+        # Descendants are searched with iter(tag), which walks the tree in C without XPath
+        # processing. It also yields the node itself, which never has the searched tag here.
+        libraries = {}
+        libraries['work'] = LibraryInfo(name='work', node=None, source_file='')
 
-        for lib_node in top_elem.findall('.//library_clause'):
-            for id_node in lib_node.findall('.//identifier'):
+        for lib_node in top_elem.iter('library_clause'):
+            for id_node in lib_node.iter('identifier'):
                 lib_name = id_node.subtext
                 lib_head_comments, lib_tail_comments = self.get_head_and_tail_comments(lib_node)
-                lib_info = Namespace(name=lib_name,
-                                     node=lib_node,
-                                     use=[],
-                                     source_file=top_elem.filename,
-                                     head_comments=lib_head_comments,
-                                     tail_comments = lib_tail_comments)
+                lib_info = LibraryInfo(name=lib_name,
+                                       node=lib_node,
+                                       source_file=top_elem.filename,
+                                       head_comments=lib_head_comments,
+                                       tail_comments=lib_tail_comments)
                 libraries[lib_name.lower()] = lib_info
                 self.add_label('library', lib_name, lib_info)
                 # print 'Added library', lib_name
 
         # Analyze USE clauses
-        for use_node in top_elem.findall('.//use_clause'):
-            for selected_name in use_node.findall('.//selected_name'):
-                name_node = selected_name.find('.//name')
+        for use_node in top_elem.iter('use_clause'):
+            for selected_name in use_node.iter('selected_name'):
+                name_node = next(selected_name.iter('name'), None)
                 use_head_comments, use_tail_comments = self.get_head_and_tail_comments(use_node)
                 if name_node is None or len(name_node) < 2:
                     raise RuntimeError('Use clause must have a prefix and one or more suffixes')
                 lib_name = name_node[0].subtext
                 sel_name = ''.join(n.subtext for n in name_node[1:])
-                use_info = Namespace(label=sel_name,
-                                     node=use_node,
-                                     head_comments=lib_head_comments,
-                                     tail_comments = lib_tail_comments)
+                use_info = UseInfo(label=sel_name,
+                                   node=use_node,
+                                   head_comments=use_head_comments,
+                                   tail_comments=use_tail_comments)
                 # print 'Use lib', lib_name
-                if lib_name.lower() not in libraries:
+                lib_key = lib_name.lower()
+                if lib_key not in libraries:
                     print(use_node.subtext)
                     raise RuntimeError("Use of library '%s' before it is defined" % lib_name);
-                libraries[lib_name.lower()].use.append(use_info)
+                libraries[lib_key].use.append(use_info)
 
         return libraries
 
@@ -490,7 +855,7 @@ class VHDLParser(XElement):
             element_name (str): Xpath used to find the element within the list
 
         Return:
-            (list): list of dicts containing:
+            (list): list of :class:`InterfaceInfo` containing:
 
                 name_list (list of str): list of port/generic identifier names. Is empty if the entry is for an isolated (sectionning) comment.
                 definition (str): rest of the port/generics definition
@@ -513,10 +878,10 @@ class VHDLParser(XElement):
                 name_list = [ n.subtext for n in elem.findall('interface_unknown_declaration.identifier')]
                 definition = elem.subtextbetween(start_after='interface_unknown_declaration.colon', end_before=['interface_list.semicolon'] + tail_comment_elems)
                 comments = '\n'.join(ee.subtext for ee in header_comment_elems + tail_comment_elems)
-                interface_list.append(Namespace(names=name_list, definition=definition, comments=comments))
+                interface_list.append(InterfaceInfo(names=name_list, definition=definition, comments=comments))
             elif elem.tag == 'comment_block':
                 comments = elem.subtext
-                interface_list.append(Namespace(names=[], definition=None, comments=comments))
+                interface_list.append(InterfaceInfo(names=[], definition=None, comments=comments))
         return interface_list
 
     def analyze_entities(self, top_elem):
@@ -530,7 +895,7 @@ class VHDLParser(XElement):
 
         Returns:
 
-            Namespace: containsthe following information::
+            Namespace: contains an :class:`EntityInfo` with the following information for each entity::
 
                 <entity_name_in_lowercase1>:
                     name: <entity_name>
@@ -560,15 +925,15 @@ class VHDLParser(XElement):
             brief, details = self.split_block_comments(head_comments)
             # tail_comment_block = entity_node[-1].text if entity_node[-1].tag == 'block_comment' else ''
             # entity_info = Namespace(name=entity_name, ports=ports, generics=generics, brief=brief, details=details, source_file=filename)
-            entity_info = Namespace(name=entity_name,
-                                    ports=ports,
-                                    generics=generics,
-                                    brief=brief,
-                                    details=details,
-                                    tail_comment=tail_comments,
-                                    source_file=top_elem.filename,
-                                    entity_node=entity_node,
-                                    file_node=top_elem)
+            entity_info = EntityInfo(name=entity_name,
+                                     ports=ports,
+                                     generics=generics,
+                                     brief=brief,
+                                     details=details,
+                                     tail_comment=tail_comments,
+                                     source_file=top_elem.filename,
+                                     entity_node=entity_node,
+                                     file_node=top_elem)
             entities[entity_name.lower()] = entity_info
 
             # Add labels to the label list
@@ -576,21 +941,30 @@ class VHDLParser(XElement):
             for port in ports:
                 self.add_label(f'entity[{entity_name}].port{port.names}', port.names, port)
             for gen in generics:
-                self.add_label(f'entity[{entity_name}].generic{port.names}', gen.names, port)
+                self.add_label(f'entity[{entity_name}].generic{gen.names}', gen.names, gen)
         return entities
 
     def replace(self, s, substrings, replacement_string):
         """ Replace all occurences of the substrings in string ``s`` by ``replacement_string``
+
+        The substrings are combined in a single regex alternation so the string is scanned only
+        once. The compiled regex is cached for each distinct set of substrings.
         """
-        for ss in substrings:
-            s = s.replace(ss,replacement_string)
-        return s
+        key = tuple(substrings)
+        if not key:  # an empty alternation would match everywhere
+            return s
+        regex = _replace_regex_cache.get(key)
+        if regex is None:
+            regex = _replace_regex_cache[key] = re.compile('|'.join(map(re.escape, key)))
+        return regex.sub(lambda m: replacement_string, s)
 
     def is_fence(self, s):
-        r""" Returns True if the string is a valid RestructuredText fence line.
+        r""" Returns True if the string is a decorative header line.
 
-        A valid fence line contains **only** a consecutive series of three or more fence characters preceded and succeded by spaces.
-        The string such as ``=== New Function``  or  ``--- Function below ---``  return False.
+        A decorative header starts with a consecutive series of three or more identical fence
+        characters (``*=-#%^``), optionally preceded by spaces, followed by some text, such as ``===
+        New Function`` or ``--- Function below ---``. A line that contains only fence characters,
+        which is a valid RestructuredText fence, returns False.
 
         Parameters:
 
@@ -602,39 +976,46 @@ class VHDLParser(XElement):
 
         """
         s = s.strip()
-        if not s:
+        if len(s) < 4:  # a fence of three characters followed by some text
             return False
-        return s[0] in "*=-#%^" and s.startswith(s[0]*3) and s != s[0] * len(s)
+        c = s[0]
+        # Test the characters one by one and count in C instead of building fence strings
+        return c in _FENCE_CHARS and s[1] == c and s[2] == c and s.count(c) != len(s)
 
     def dedent(self, s):
         return textwrap.dedent('\n'.join(s)).splitlines()
 
-    def remove_comment_marks(self, lines, dedent=False):
-        """ Remove leading and trailing comment marks, decorative headers as well as Doxygen markers.
+    def iter_clean_lines(self, lines):
+        """ Yields the lines of `lines` one at a time, stripped of their comment marks and Doxygen
+        markers, skipping decorative headers. See :meth:`remove_comment_marks`.
 
-        A decorative header is a repeated fence character (`-`,`*`, `#` etc) followed by some text (e.g. `### Example 1`, `------ Example 2 ---)`).
+        Parameters:
+
+            lines (iterable of str): lines to be cleaned. Can be any iterable, such as a file-like object.
         """
-        new_lines = []
+        sub = _COMMENT_MARKS_RE.sub
+        is_fence = self.is_fence
         for line in lines:
-            s = line.strip()
             # Discard decorative headers
-            if self.is_fence(line):
+            if is_fence(line):
                 continue
-            # Remove leading comment marks
-            for ss in ('/*', '--!', '--'):
-                if s.startswith(ss):
-                    s = s[len(ss):]
-            # Remove trailing comment marks
-            for ss in ('*/', ):
-                if s.endswith(ss):
-                    s = s[:-len(ss)]
-            # Remove Doxygen markers
-            for ss in ('@brief', '@details'):
-                s = s.replace(ss, '')
-            new_lines.append(s)
+            yield sub('', line.rstrip('\n'))
+
+    def remove_comment_marks(self, lines, dedent=False):
+        """ Remove leading and trailing comment marks, decorative headers as well as Doxygen markers.
+
+        A decorative header is a repeated fence character (`-`,`*`, `#` etc) followed by some text (e.g. `### Example 1`, `------ Example 2 ---)`).
+
+        The marks are removed from all the lines at once with a single regex substitution on the joined lines.
+        """
+        is_fence = self.is_fence
+        lines = [line for line in lines if not is_fence(line)]  # Discard decorative headers
+        if not lines:
+            return []
+        text = _COMMENT_MARKS_RE.sub('', '\n'.join(lines))
         if dedent:
-            new_lines = self.dedent(new_lines)
-        return new_lines
+            return textwrap.dedent(text).splitlines()
+        return text.split('\n')
 
     def split_block_comments(self, block_comments, dedent_brief=True, dedent_details=True, verbose=0):
         """
@@ -658,10 +1039,9 @@ class VHDLParser(XElement):
 
         # for block in block_comments:
         # lines = self.replace(block_comments.subtext, ('/*', '*/', '--!', '--', '@brief', '@details'), '')
-        lines = self.remove_comment_marks(block_comments.subtext.splitlines())
-        if verbose:
-            print(f'lines = {lines}')
-        for line in lines:
+        # Clean the lines one at a time instead of building intermediate line lists. The text is
+        # split with splitlines() like in dedent(), so form feeds split the lines consistently.
+        for line in self.iter_clean_lines(block_comments.subtext.splitlines()):
             if verbose:
                 print(f'sl={line!r}')
             if is_brief and brief and not line: # is en empty line once we have a brief
@@ -677,74 +1057,148 @@ class VHDLParser(XElement):
             details = self.dedent(details)
         return brief, details
 
+    def _lookup_entity(self, entity_name):
+        """ Returns the entity `entity_name` (case insensitive), or None if it is not known.
+
+        The lookups are memoized on the name as provided, so the name is case-folded only once.
+        """
+        try:
+            return self._entity_cache[entity_name]
+        except KeyError:
+            pass
+        entity = self.entities.get(entity_name.lower())
+        if entity is not None:
+            self._entity_cache[entity_name] = entity
+        return entity
+
     def get_entity(self, entity_name):
-        if entity_name.lower() in self.entities:
-            return self.entities[entity_name.lower()]
+        entity = self._lookup_entity(entity_name)
+        if entity is not None:
+            return entity
         raise RuntimeError(f'Could not find entity {entity_name} in the current file set. '
                            f"Known entities are {','.join(self.entities.keys())}. Was the VHDL file parsed?")
 
     def get_file_with_entity(self, name):
         """Returns the file node than contains the entity `name`
         """
-        name = name.lower()
-        if name in self.entities:
-            return self.entities[name].file_node
+        entity = self._lookup_entity(name)
+        if entity is not None:
+            return entity.file_node
         print(f'Cannot find {name} in {list(self.entities.keys())}')
 
 
-    def get_comments(self, entity, start_before=None, start_after=None, end_before=None, end_after=None, dedent=True):
-        def match(source, target):
-            if not target: return False
-            r = source.find(target)
-            return r >= 0
+    def get_comments(self, entity, start_before=None, start_after=None, end_before=None, end_after=None, dedent=True, verbose=0):
+        """ Returns the comment lines of the file defining `entity` that are between the lines
+        matching the specified search strings, with the comment marks removed.
+
+        The results are cached, so repeated searches for the same entity and search strings do
+        not scan the comments again.
+
+        If `verbose` is non-zero, debugging messages are printed when the comments are searched.
+
+        Returns:
+
+            tuple: tuple of the matching comment lines (str)
+        """
+        key = (entity.lower(), start_before, start_after, end_before, end_after, dedent)
+        lines = self._comments_cache.get(key)
+        if lines is None:
+            lines = self._comments_cache[key] = tuple(self.find_comments(entity, start_before, start_after, end_before, end_after, dedent, verbose))
+        return lines
+
+    def get_comment_lines(self, entity):
+        """ Returns the text of all the ``comment_block`` nodes in the file defining `entity`, as a
+        list containing a (text, list of lines) tuple per comment block.
 
+        The lines are indexed when the file is added to the parser.
+        """
         file = self.get_file_with_entity(entity)
         if file is None:
             raise ValueError(f'get_comments: Cannot find entity {entity}')
+        return self._comment_index[file.filename]
+
+    def find_comments(self, entity, start_before=None, start_after=None, end_before=None, end_after=None, dedent=True, verbose=0):
+        """ Uncached implementation of :meth:`get_comments`. Returns a list of lines.
+        """
+        # The markers are literal strings and are searched with the `in` operator, which uses the
+        # fast substring search of `str`. When there are multiple markers, lines that contain none
+        # of them are detected with a single regex search.
+        markers = [m for m in (start_before, start_after, end_before, end_after) if m]
+        if not (start_before or start_after):  # nothing can be captured
+            if verbose:
+                print(f'No start string was specified to search the comments of entity {entity}')
+            return []
+        marker_search = _compile_markers(*markers).search if len(markers) > 1 else None
         matching_lines = []
+        append = matching_lines.append  # avoids an attribute lookup for each captured line
         capture = False
-        for bc in file.iterfind('.//comment_block'):
-            lines = bc.subtext.splitlines()
+        done = False  # True once the end of the captured lines was found
+        for text, lines in self.get_comment_lines(entity):
+            # Unless lines are being captured, only the blocks containing a start string are scanned
+            if not capture and not ((start_before and start_before in text) or (start_after and start_after in text)):
+                continue
             for s in lines:
-                if match(s, start_before):
+                if marker_search is not None and marker_search(s) is None:
+                    if capture:
+                        append(s)
+                    continue
+                if start_before and start_before in s:
                     capture = True
-                if match(s, end_before):
+                if end_before and end_before in s:
+                    done = capture
                     break
                 if capture:
-                    matching_lines.append(s)
-                if match(s, start_after):
+                    append(s)
+                if start_after and start_after in s:
                     capture = True
-                    print(f'Found match after {start_after} in entity {entity}')
-                if match(s, end_after):
+                    if verbose:
+                        print(f'Found match after {start_after} in entity {entity}')
+                if end_after and end_after in s:
+                    done = capture
                     break
-            if matching_lines:  # stop at the end of this block if we found anything in it
+            if done or matching_lines:  # stop at the end of this block if we found anything in it
                 break
-        # if not matching_lines:
-        #     print(f"COuld not find '{start_after}'")
-        # else:
-        #     print(f"match={' '.join(matching_lines)}")
+        if verbose and not matching_lines:
+            print(f"Could not find '{start_before or start_after}' in the comments of entity {entity}")
         return self.remove_comment_marks(matching_lines, dedent=dedent)
 
 
-def pp(elem, level=0, collapse=(), max_depth=0, width=80):
-    """ Pretty printer for the XElement tree.
+def _parse_file_worker(filename, cache_dir, verbose=0):
+    """ Parse a VHDL file in a worker process and return the ``(filename, file_element)`` tuple.
+
+    Used by :meth:`VHDLParser.parse_files`. Defined at the module level so it can be pickled.
     """
-    #skip = ((not t.expr_name or (t.expr_name.startswith('_') and 1)) and t.children) or not t.text
-    collapsed =  elem.tag in collapse or (max_depth and level>=max_depth)
+    return filename, VHDLParser(cache_dir=cache_dir).build_file_element(filename, verbose=verbose)
+
 
-    #skip = bool(t.children) or not t.text
-    #skip = False
-    #if not collapsed:
-    indent = '   ' * level
-    collapsed_str = '(collapsed) ' if collapsed else ''
-    text = ('' if len(elem) and not collapsed else repr(elem.subtext))[:width]
-    tag = f'<{elem.tag}>' if elem.tag != '_' else ''
-    print(f"{indent}{tag}({id(elem):x}) {collapsed_str}{text} @({elem.line+1},{elem.col+1})")
+_INDENTS = tuple('   ' * i for i in range(128))  # precomputed indentation strings used by pp()
 
-        #print  '%s%s' % ('   '*(level+1), )
-    if not collapsed:
-        for e in elem:
-            pp(e, level=(level+1), collapse=collapse, max_depth=max_depth)
+def pp(elem, level=0, collapse=(), max_depth=0, width=80, file=None):
+    """ Pretty printer for the XElement tree.
+
+    The tree is traversed iteratively and the output is written to `file` (stdout if `None`) in a
+    single operation.
+    """
+    collapse = frozenset(collapse)
+    tag_strings = {'_': ''}  # {tag: rendered tag}, filled as new tags are encountered
+    out = []
+    stack = [(elem, level)]
+    while stack:
+        elem, level = stack.pop()
+        tag = elem.tag
+        collapsed =  tag in collapse or (max_depth and level>=max_depth)
+        indent = _INDENTS[level] if level < 128 else '   ' * level
+        collapsed_str = '(collapsed) ' if collapsed else ''
+        # truncate the text before repr() so long subtexts are not entirely escaped
+        text = '' if len(elem) and not collapsed else repr(elem.subtext[:width])[:width]
+        tag = tag_strings.get(tag)
+        if tag is None:
+            tag = tag_strings[elem.tag] = f'<{elem.tag}>'
+        out.append(f"{indent}{tag}({id(elem):x}) {collapsed_str}{text} @({elem.line+1},{elem.col+1})")
+        if not collapsed:
+            # push the children in reverse order so they are printed in their original order
+            stack.extend((e, level + 1) for e in reversed(elem))
+    (sys.stdout if file is None else file).write('\n'.join(out) + '\n')
 
 
 
@@ -753,6 +1207,14 @@ if __name__ == '__main__':
     v = VHDLParser()
     # v = VHDLParser()
     print(('parsing %s'% sys.argv[1]))
-    p=v.parse_file(sys.argv[1])
+    if '--profile' in sys.argv[2:]:
+        # Show where the parsing time is spent (VSG parsing, tree building, comment processing)
+        import cProfile
+        import pstats
+        with cProfile.Profile() as profiler:
+            p = v.parse_file(sys.argv[1], verbose=1)
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(30)
+    else:
+        p=v.parse_file(sys.argv[1])
     e = v.get_entity('GPIO')
     # f = v.get_file_with_entity('FFT')
\ No newline at end of file
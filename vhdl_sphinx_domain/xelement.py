@@ -3,54 +3,261 @@
 
 # Standard packages
 
+import re
+import sys
+import weakref
 from xml.etree.ElementTree import Element
 
+# Incremented every time the text or the structure of any XElement tree is modified. Cached
+# subtexts computed during an earlier generation are considered stale. There are no parent links
+# in the tree, so this is the only way to invalidate the cached subtext of the ancestors of a
+# modified element.
+_tree_generation = 0
+
+_POSITION_SLOTS = {'col': '_col', 'line': '_line'}  # {position name: XElement slot storing it}
+_NOT_ATTRIBUTES = frozenset(('_subtext_cache', '_col', '_line', 'col', 'line'))  # names never set in the attributes
+
+# Pickle does not memoize integers: every unpickled position would be a separate int object. The
+# positions of unpickled elements are shared through this dict instead, like the tree builder shares
+# the line number of all the tokens of a line.
+_positions = {}
+
+# Tags that ElementPath treats as a plain tag name (see xml.etree.ElementPath.xpath_tokenizer)
+_SIMPLE_TAG_RE = re.compile(r'''[^/\[\]()@!=\s.*:{}'"][^/\[\]()@!=\s*:{}'"]*\Z''')
+
+# Lookup tables computed from the trees, kept out of the elements so they do not need a slot. Each
+# table is {element: (tree generation, value)}, see _cached().
+
+# Text indexes used by XElement.findwithtext(): {caseless: {element: (tree generation, {text: first descendant with that text})}}
+_text_indexes = {False: weakref.WeakKeyDictionary(), True: weakref.WeakKeyDictionary()}
+
+# Child indexes used by XElement.index(): {element: (tree generation, {id(child): index})}
+_child_indexes = weakref.WeakKeyDictionary()
+
+# Parent maps used by XElement.findindex(): {element: (tree generation, {id(descendant): (parent, index)})}
+_parent_maps = weakref.WeakKeyDictionary()
+
+
+def _cached(table, elem, build):
+    """ Returns the value computed by `build(elem)`, cached in the weak-keyed `table`.
+
+    The value is built on first use, and is rebuilt if a tree was modified since. The elements
+    referenced by the value are alive as long as it is valid, so the ids it uses cannot be reused.
+    The value must not reference `elem` itself, which would keep the entry alive forever.
+    """
+    try:
+        generation, value = table[elem]
+        if generation == _tree_generation:
+            return value
+    except KeyError:
+        pass
+    value = build(elem)
+    table[elem] = (_tree_generation, value)
+    return value
+
+def _build_child_index(elem):
+    child_index = {}
+    for i, e in enumerate(elem):
+        child_index.setdefault(id(e), i)  # the first occurrence is returned, like list.index()
+    return child_index
+
+def _build_parent_map(elem):
+    # The parent of the children of `elem` is None, since `elem` must not be referenced
+    parent_map = {id(e): (None, i) for i, e in reversed(list(enumerate(elem)))}  # first occurrence wins
+    elements = elem.iter()
+    next(elements)  # the children of `elem` are already mapped
+    for parent in elements:
+        for i, e in enumerate(parent):
+            if id(e) not in parent_map:  # the first occurrence is returned, like list.index()
+                parent_map[id(e)] = (parent, i)
+    return parent_map
+
+def _build_text_index(elem, caseless):
+    index = {}
+    elements = elem.iter()
+    next(elements)  # skip `elem`, which is not a descendant
+    for e in elements:
+        text = e.text
+        if text:
+            index.setdefault(text.upper() if caseless else text, e)
+    return index
+
 
 class XElement(Element):
     """ Extended ElementTree.Element with additional useful methods.
-    """
 
+    XElement trees must be modified only through the XElement methods, which invalidate the cached
+    subtexts and indexes. In particular, do not use ``ElementTree.SubElement()``, which appends the
+    new element in C without calling ``append()``: use ``parent.append(XElement(...))`` instead.
+    """
 
-    def __init__(self, tag, attrib={}, text=None, **extra):
-        super().__init__(tag, attrib=attrib, **extra)
+    # No per-instance __dict__: saves memory and speeds up attribute access on large trees. The
+    # position of the token elements is stored in slots rather than in the attributes, so the token
+    # elements do not need an attribute dict.
+    __slots__ = ('_subtext_cache',  # (tree generation, subtext) tuple, see `subtext`
+                 '_col',  # column of the token in the source file, see `col`
+                 '_line')  # line of the token in the source file, see `line`
+
+    def __init__(self, tag, attrib=None, text=None, col=None, line=None, **extra):
+        # Intern the tags: all the elements with the same tag share a single string, and tag
+        # comparisons succeed on the identity check without comparing the characters.
+        if type(tag) is str:
+            tag = sys.intern(tag)
+        # Element copies the attrib argument even when it is empty: pass it only when there is one
+        if attrib is None:
+            super().__init__(tag, **extra)
+        else:
+            super().__init__(tag, attrib, **extra)
+        # Bypass __setattr__, which would create the attribute dict of the element
         if text is not None:
-            self.text = text
+            Element.__setattr__(self, 'text', text)
+        if col is not None:
+            Element.__setattr__(self, '_col', col)
+        if line is not None:
+            Element.__setattr__(self, '_line', line)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        for name, slot in _POSITION_SLOTS.items():
+            try:
+                state[name] = object.__getattribute__(self, slot)
+            except AttributeError:  # unset slot
+                pass
+        return state
+
+    def __setstate__(self, state):
+        for name, slot in _POSITION_SLOTS.items():
+            if name in state:
+                position = state.pop(name)
+                Element.__setattr__(self, slot, _positions.setdefault(position, position))
+        # Empty attributes or children lists would make Element allocate its attribute and children
+        # storage, which the elements created by the tree builder do not have
+        for name in ('attrib', '_children'):
+            if name in state and not state[name]:
+                del state[name]
+        # Unpickled tags are not interned: intern them so they stay identical to the tags of newly
+        # created elements
+        if type(state['tag']) is str:
+            state['tag'] = sys.intern(state['tag'])
+        super().__setstate__(state)
 
     def __getattr__(self, name):
-        if name in self.attrib:
-            return self.attrib[name]
-        elif len(self):
-            return getattr(self[0], name)
-        else:
-            raise AttributeError(f'Element or leading subelement have no attribute {name}')
+        # Called only if the attribute or slot does not exist or is not set: look up the attributes
+        if name[0] != '_':  # private attributes (e.g. unset slots) are never looked up in the attributes
+            try:
+                return self.attrib[name]
+            except KeyError:
+                pass
+        raise AttributeError(f'Element has no attribute {name}')
 
     def __setattr__(self, name, value):
-        if name in self.attrib:
+        if name == 'text' or name == 'tail':
+            global _tree_generation
+            _tree_generation += 1
+        elif name not in _NOT_ATTRIBUTES and name in self.attrib:
             self.attrib[name] = value
-        else:
-            super().__setattr__(name, value)
-
-    # @property
-    # def col(self):
-    #     """Get the col attribute of this element or from the first element of a sub-(sub-...) element
-    #     """
-    #     if 'col' in self.attrib:
-    #         return self.attrib['col']
-    #     elif len(self):
-    #         return self[0].col
-    #     else:
-    #         return None
-
-    # @col.setter
-    # def col(self, value):
-    #     """ Sets the col attribute on this element (not the subelement).The subelement col attribute is no longer returned unless col is set to None.
-    #     """
-    #     self.attrib['col'] = value
+            return
+        super().__setattr__(name, value)
+
+    def get(self, key, default=None):
+        """ Like Element.get(), but also returns the ``col`` and ``line`` positions, which are not
+        stored in the attributes. The position of the leading subelement is not returned.
+        """
+        slot = _POSITION_SLOTS.get(key)
+        if slot is not None:
+            try:
+                return object.__getattribute__(self, slot)
+            except AttributeError:  # unset slot
+                return default
+        return super().get(key, default)
+
+    # Production and group elements have no position of their own: they are located at the position
+    # of their leading token, which is found by descending explicitly into the leading subelements.
+
+    @property
+    def col(self):
+        """ Column of this element in the source file, or of its leading (sub-)subelement. """
+        e = self
+        while True:
+            try:
+                return e._col
+            except AttributeError:
+                if not len(e):
+                    raise AttributeError('Element or leading subelement have no attribute col') from None
+                e = e[0]
+
+    @col.setter
+    def col(self, value):
+        Element.__setattr__(self, '_col', value)
+
+    @property
+    def line(self):
+        """ Line of this element in the source file, or of its leading (sub-)subelement. """
+        e = self
+        while True:
+            try:
+                return e._line
+            except AttributeError:
+                if not len(e):
+                    raise AttributeError('Element or leading subelement have no attribute line') from None
+                e = e[0]
+
+    @line.setter
+    def line(self, value):
+        Element.__setattr__(self, '_line', value)
+
+    # Structure modifications invalidate all cached subtexts
+
+    def append(self, subelement):
+        global _tree_generation
+        _tree_generation += 1
+        super().append(subelement)
+
+    def extend(self, elements):
+        global _tree_generation
+        _tree_generation += 1
+        super().extend(elements)
+
+    def insert(self, index, subelement):
+        global _tree_generation
+        _tree_generation += 1
+        super().insert(index, subelement)
+
+    def remove(self, subelement):
+        global _tree_generation
+        _tree_generation += 1
+        super().remove(subelement)
+
+    def __setitem__(self, index, element):
+        global _tree_generation
+        _tree_generation += 1
+        super().__setitem__(index, element)
+
+    def clear(self):
+        global _tree_generation
+        _tree_generation += 1
+        super().clear()
+
+    def __delitem__(self, index):
+        global _tree_generation
+        _tree_generation += 1
+        super().__delitem__(index)
 
     @property
     def subtext(self):
-        """Return the text of this element and all its subelements."""
-        return ''.join(t for t in self.itertext())
+        """Return the text of this element and all its subelements.
+
+        The result is cached and is recomputed only if a tree was modified since.
+        """
+        try:
+            cache = self._subtext_cache
+            if cache[0] == _tree_generation:
+                return cache[1]
+        except AttributeError:  # not cached yet
+            pass
+        subtext = ''.join(self.itertext())
+        self._subtext_cache = (_tree_generation, subtext)
+        return subtext
 
 
     # Do not define __eq__ or __ne__ to handle strings : this breaks elem.remove()
@@ -86,8 +293,15 @@ class XElement(Element):
 
             Raises a ValueError if the children cannot be found
         """
-        return self._children.index(children)
+        i = self._child_index().get(id(children))
+        if i is None:
+            raise ValueError('Element is not a child of this element')
+        return i
 
+    def _child_index(self):
+        """ Returns a dict giving the index of the children of this element, indexed by their id.
+        """
+        return _cached(_child_indexes, self, _build_child_index)
 
     def findindex(self, elem_or_path):
         """ Like find(), looks recursively for an element, but returns both the parent and index of
@@ -102,9 +316,16 @@ class XElement(Element):
             child = self.find(elem_or_path)
         else:
             child = elem_or_path
-        for parent in self.iter():
-            if child in parent:
-                return (parent, parent.index(child))
+        found = self._parent_map().get(id(child))
+        if found is not None and found[0] is None:  # child of this element
+            return (self, found[1])
+        return found
+
+    def _parent_map(self):
+        """ Returns a dict giving the (parent, index) of the descendants of this element, indexed by
+        their id. The parent of the children of this element is `None`.
+        """
+        return _cached(_parent_maps, self, _build_parent_map)
 
     def findsibling(self, elem_or_path, offset=1):
         (p,i) = self.findindex(elem_or_path)
@@ -114,41 +335,98 @@ class XElement(Element):
     def findwithtext(self,  text, path='.//*', caseless=False):
         if caseless:
             text = text.upper()
+        if path == './/*':  # searches of all the descendants are answered from an index
+            return self._text_index(caseless).get(text)
         for e in self.iterfind(path):
             if e.text and (e.text.upper() if caseless else e.text) == text:
                 return e
 
+    def _text_index(self, caseless):
+        """ Returns a dict giving the first descendant of this element with each text (in
+        uppercase if `caseless` is True).
+        """
+        return _cached(_text_indexes[caseless], self, lambda elem: _build_text_index(elem, caseless))
+
     def findwithsubtext(self, path, text, caseless=False):
         if caseless:
             text = text.upper()
-        for e in self.iterfind(path):
-            if e.subtext and (e.subtext.upper() if caseless else e.subtext) == text:
+        if path == './/*':  # all the descendants, without the XPath machinery
+            elements = self.iter()
+            next(elements)  # skip this element, which is not a descendant
+        else:
+            elements = self.iterfind(path)
+        for e in elements:
+            subtext = e.subtext
+            if subtext and (subtext.upper() if caseless else subtext) == text:
                 return e
 
+    def find(self, path, namespaces=None):
+        """ Like Element.find(), but searches for plain dotted tags (e.g. the
+        'entity_declaration.identifier' token tags) and './/' followed by a plain tag without the
+        XPath machinery. Element.find() handles plain tags without dots in C, but hands the other
+        paths over to ElementPath, which looks up the compiled path and chains its selectors on
+        every call.
+        """
+        if namespaces is None:
+            if path[:3] == './/' and _SIMPLE_TAG_RE.match(path, 3):
+                for e in self.iter(path[3:]):
+                    if e is not self:  # this element is not one of its descendants
+                        return e
+                return None
+            if '.' in path and _SIMPLE_TAG_RE.match(path):
+                for e in self:
+                    if e.tag == path:
+                        return e
+                return None
+        return super().find(path, namespaces)
+
     def findall(self, paths, namespaces=None):
         """ Extesion of findall to return a list of nodes matching one or multiple tag or Xpath strings.
 
         Parameters:
 
             paths (str or list of str): If `paths` is a string, search for the nodes with the tag or
-                XPath it specifies. If `paths` is a list of strings, returns nodes matchin all the
-                specified tags or Xpaths.
+                XPath it specifies. If `paths` is a list of strings, search for the nodes matching
+                each of the specified tags or Xpaths.
 
-        Returns: list: list of nodes matching the specified tag(s) or Xpath(s). If multiple strings
-            are provided, the same nodes may appear multiple times, and nodes are not listed in
-            their order of appearance in the tree.
+        Returns: list: list of nodes matching the specified tag or Xpath. If a list of strings is
+            provided, returns a list containing the list of nodes matching each string.
 
         """
         if isinstance(paths, str):
             return super().findall(paths, namespaces)
-        else:
-            return [self.findall(path, namespaces) for path in paths]
+        # Plain tags are searched without the XPath machinery. Element.findall() handles tags without
+        # dots in C, but hands dotted tags over to ElementPath: the children with the dotted tags
+        # are collected in a single pass instead. The './/tag' descendants are found with iter(tag),
+        # which runs in C.
+        results = [None] * len(paths)
+        dotted = {}  # {dotted tag: indexes of the paths searching for it}
+        for i, path in enumerate(paths):
+            if namespaces is None and path[:3] == './/' and _SIMPLE_TAG_RE.match(path, 3):
+                found = list(self.iter(path[3:]))
+                if found and found[0] is self:  # this element is not one of its descendants
+                    del found[0]
+                results[i] = found
+            elif namespaces is None and '.' in path and _SIMPLE_TAG_RE.match(path):
+                dotted.setdefault(path, []).append(i)
+            else:
+                results[i] = super().findall(path, namespaces)
+        if dotted:
+            children = {tag: [] for tag in dotted}
+            for e in self:
+                found = children.get(e.tag)
+                if found is not None:
+                    found.append(e)
+            for tag, indexes in dotted.items():
+                for i in indexes:
+                    results[i] = list(children[tag])
+        return results
 
     def findallbetween(self, tag, start_at=None, start_after=None, stop_before=None, stop_at=None, recurse=True):
-        return [e for e in self.iterbetween(start_at=start_at, start_after=start_after, stop_before=stop_before, stop_at=stop_at, recurse=recurse) if e.tag == tag]
+        return list(self.iterbetween(start_at=start_at, start_after=start_after, stop_before=stop_before, stop_at=stop_at, recurse=recurse, tag=tag))
 
 
-    def iterbetween(self, start_at=None, start_after=None, stop_before=None, stop_at=None, recurse=True):
+    def iterbetween(self, start_at=None, start_after=None, stop_before=None, stop_at=None, recurse=True, tag=None):
         """ Same as `iter()`, excepts this method yields only the elements between the specified starting and ending nodes.
 
         Parameters:
@@ -157,6 +435,7 @@ class XElement(Element):
             start_after (str): Xpath describing the element after which the elements will be included
             stop_before (str): Xpath indicating the element before which the elements will be included.
             stop_at (str): Xpath indicating the last element to be included.
+            tag (str): If not `None`, only the elements with this tag are yielded. The boundaries are found among all the elements.
 
         Notes:
 
@@ -164,44 +443,59 @@ class XElement(Element):
             - Both end options should not be provided. If so, stop_before will takes precedence over stop_at.
             - The end nodes should not appear before the start nodes
         """
-        if start_at is None:
-            start_at = tuple()
-        elif not isinstance(start_at, (list, tuple)):
-            start_at = (start_at,)
-        start_at_nodes = [self.find(n) if isinstance(n, str) else n for n in start_at]
-
-        if start_after is None:
-            start_after = tuple()
-        if not isinstance(start_after, (list, tuple)):
-            start_after = (start_after,)
-        start_after_nodes = [self.find(n) if isinstance(n, str) else n for n in start_after]
-
-        if stop_at is None:
-            stop_at = tuple()
-        if not isinstance(stop_at, (list, tuple)):
-            stop_at = (stop_at,)
-        stop_at_nodes = [self.find(n) if isinstance(n, str) else n for n in stop_at]
-
-        if stop_before is None:
-            stop_before = tuple()
-        if not isinstance(stop_before, (list, tuple)):
-            stop_before = (stop_before,)
-        stop_before_nodes = [self.find(n) if isinstance(n, str) else n for n in stop_before]
-
-        started = not start_at and not start_after
-        for e in self.iter() if recurse else self:
-            if e in start_at_nodes:
-                started = True
-            if started and e in stop_before_nodes:
+        # The boundary nodes are tested by identity in sets, which takes constant time per element
+        start_at_ids = self._find_ids(start_at)
+        start_after_ids = self._find_ids(start_after)
+        stop_at_ids = self._find_ids(stop_at)
+        stop_before_ids = self._find_ids(stop_before)
+
+        # The loops are specialized for the boundaries that were specified, so the elements are not
+        # tested against boundaries that cannot occur anymore.
+        elements = self.iter() if recurse else iter(self)
+        if start_at_ids or start_after_ids:
+            # Skip the elements before the start, and process the starting element
+            for e in elements:
+                e_id = id(e)
+                if e_id in start_at_ids:
+                    if e_id in stop_before_ids:
+                        return
+                    if tag is None or e.tag == tag:
+                        yield e
+                elif e_id not in start_after_ids:
+                    continue
+                if e_id in stop_at_ids:
+                    return
                 break
+            else:  # the start was not found
+                return
+
+        if not stop_before_ids and not stop_at_ids:
+            if tag is None:
+                yield from elements
+            else:
+                for e in elements:
+                    if e.tag == tag:
+                        yield e
+            return
 
-            if started:
+        for e in elements:
+            e_id = id(e)
+            if e_id in stop_before_ids:
+                return
+            if tag is None or e.tag == tag:
                 yield e
+            if e_id in stop_at_ids:
+                return
 
-            if e in start_after_nodes:
-                started = True
-            if started and e in stop_at_nodes:
-                break
+    def _find_ids(self, nodes):
+        """ Returns the set of the ids of `nodes`, which is `None`, a node or an XPath, or a list or
+        tuple of nodes and XPaths. XPaths are resolved with `find()`.
+        """
+        if nodes is None:
+            return set()
+        if not isinstance(nodes, (list, tuple)):
+            nodes = (nodes,)
+        return {id(self.find(n) if isinstance(n, str) else n) for n in nodes}
 
     def group(self, element_list, tag):
         """ Group the elements in `element_list` into a new XElement with tag `tag`.
@@ -214,15 +508,39 @@ class XElement(Element):
         """
         if not element_list:
             return
-        for i,ee in enumerate(self):
-            if ee is element_list[0]: break
         ne = XElement(tag)
         ne.extend(element_list)
-        for ee in element_list:
-            self.remove(ee)
+        i = self._remove_children(element_list)[0]
         self.insert(i, ne)
         return ne
 
+    def _remove_children(self, elements):
+        """ Removes the children `elements` from this element and returns their former indexes.
+
+        Adjacent elements are removed with a single slice deletion, otherwise the elements are
+        removed from the last to the first so the indexes of the remaining ones do not change.
+
+        Raises a ValueError if one of the elements is not a child of this element or appears more
+        than once in `elements`, in which case no element is removed.
+        """
+        child_index = self._child_index()
+        indexes = []
+        for ee in elements:
+            i = child_index.get(id(ee))
+            if i is None:
+                raise ValueError('Element is not a child of this element')
+            indexes.append(i)
+        if len(set(indexes)) != len(indexes):  # the index of a repeated element would be deleted twice
+            raise ValueError('Element appears more than once in the elements to remove')
+        if indexes:
+            first = indexes[0]
+            if indexes == list(range(first, first + len(indexes))):
+                del self[first:first + len(indexes)]
+            else:
+                for i in sorted(indexes, reverse=True):
+                    del self[i]
+        return indexes
+
     def move(self, element, target_element, index=None):
         """ Move element(s) `element` into `target_element` at specified position.
 
@@ -238,20 +556,72 @@ class XElement(Element):
 
         # make sure we have a list of elements
         if not isinstance(element, (list, tuple)):
-            elements = list(element)
+            elements = [element]
         else:
             elements =  element
 
+        if index is not None and index < -1:
+            raise ValueError(f'Index must be either None, -1, or >= 0')
+
+        self._remove_children(elements)
         if index is None or index == -1:
-            for ee in elements:
-                self.remove(ee)
-                target_element.append(ee)
-        elif index >= 0:
-            for ee in reversed(element):
-                self.remove(ee)
-                target_element.insert(index, ee)
+            target_element.extend(elements)
         else:
-            raise ValueError(f'Index must be either None, -1, or >= 0')
+            target_element[index:index] = elements
+
+    def groupall(self, groups):
+        """ Group several lists of elements, each into a new XElement.
+
+        This is equivalent to calling `group()` on each list in sequence, but the children list is
+        rebuilt only once instead of searching and removing each element separately.
+
+        Parameters:
+
+            groups (list): List of (element_list, tag) tuples. The lists must not have elements in
+                common. Empty lists are ignored.
+        """
+        heads = {}  # id of the first element of each group -> new group element
+        grouped = set()
+        for element_list, tag in groups:
+            if not element_list:
+                continue
+            ne = XElement(tag)
+            ne.extend(element_list)
+            heads[id(element_list[0])] = ne
+            grouped.update(map(id, element_list))
+        if not grouped:
+            return
+        children = []
+        for ee in self:
+            ne = heads.get(id(ee))
+            if ne is not None:
+                children.append(ne)
+            elif id(ee) not in grouped:
+                children.append(ee)
+        self[:] = children
+
+    def moveall(self, moves):
+        """ Move several lists of elements into their target element.
+
+        This is equivalent to calling `move()` on each move in sequence, but the moved elements are
+        removed from this element in a single pass.
+
+        Parameters:
+
+            moves (list): List of (element_list, target_element, index) tuples, where `index` has
+                the same meaning as for `move()`. The lists must not have elements in common.
+        """
+        moved = set()
+        for elements, target_element, index in moves:
+            if index is None or index == -1:
+                target_element.extend(elements)
+            elif index >= 0:
+                target_element[index:index] = elements
+            else:
+                raise ValueError(f'Index must be either None, -1, or >= 0')
+            moved.update(map(id, elements))
+        if moved:
+            self[:] = [ee for ee in self if id(ee) not in moved]
 
     def subtextbetween(self, start_at=None, start_after=None, end_before=None, end_after=None):
         """ Like `subtext()`, but only returns the contatenated text between the specified starting and ending elements, crossing hierarchy.
@@ -266,15 +636,23 @@ class XElement(Element):
 
     def pp(self, level=0, collapsed_expr=['comment', 'target', 'name', 'expression', 'simple_expression', 'simple_name',  'association_element', '_'], max_depth=0, width=80):
         """ Pretty printer for the XElement tree.
+
+        The tree is traversed iteratively and the output is printed in a single write.
         """
-        #skip = ((not t.expr_name or (t.expr_name.startswith('_') and 1)) and t.children) or not t.text
-        collapsed =  self.tag in collapsed_expr or (max_depth and level>=max_depth)
-        #skip = bool(t.children) or not t.text
-        #skip = False
-        #if not collapsed:
-        print(('%s<%s>(%x) %s%s' % ('   '*level, self.tag, id(self), '(collapsed) ' if collapsed else '', ('' if len(self) and not collapsed else '='+repr(self.subtext) if collapsed else '='+repr(self.text))[:width])))
-
-            #print  '%s%s' % ('   '*(level+1), )
-        if not collapsed:
-            for elem in self:
-                elem.pp(level=(level+1), collapsed_expr=collapsed_expr, max_depth=max_depth)
+        collapsed_expr = frozenset(collapsed_expr)
+        out = []
+        stack = [(self, level)]
+        while stack:
+            elem, level = stack.pop()
+            collapsed = elem.tag in collapsed_expr or (max_depth and level >= max_depth)
+            if collapsed:
+                text = '=' + repr(elem.subtext[:width])  # truncate before repr() so long subtexts are not entirely escaped
+            elif len(elem):
+                text = ''
+            else:
+                text = '=' + repr(elem.text)
+            out.append('%s<%s>(%x) %s%s' % ('   '*level, elem.tag, id(elem), '(collapsed) ' if collapsed else '', text[:width]))
+            if not collapsed:
+                # push the children in reverse order so they are printed in their original order
+                stack.extend((e, level + 1) for e in reversed(elem))
+        sys.stdout.write('\n'.join(out) + '\n')